@@ -19,7 +19,11 @@ class AdvisoryService:
     def generate_advice(self, analysis_results: list) -> str:
         """Generate investment advice"""
         
-        top_5 = analysis_results[:5]
+        # Primary-strategy fields only; per-strategy results would conflict
+        top_5 = [
+            {k: v for k, v in result.items() if k != "strategies"}
+            for result in analysis_results[:5]
+        ]
         
         prompt = f"""
 You are a professional investment advisor. Based on these analysis results,
@@ -2,110 +2,268 @@
 # ANALYSIS SERVICE (Rune β)
 # ============================================================
 
+import operator
+from backend.data_service import DEFAULT_RATIOS
+
+# ------------------------------------------------------------
+# SCORING STRATEGIES
+# ------------------------------------------------------------
+# Each metric rule lists bands checked in order; the first band whose
+# bounds all hold awards its points (scaled by the rule weight),
+# otherwise "else" applies. Totals are normalized to 0-100 against the
+# strategy's best possible total so strategies compare directly.
+# Bounds: min/max are inclusive, above/below are exclusive. Risk levels
+# are checked in order and match when any condition holds;
+# recommendations match on min_score and, optionally, a required risk
+# level. Missing metrics fall back to DEFAULT_RATIOS.
+
+DEFAULT_STRATEGY = "balanced"
+
+STRATEGIES = {
+    "balanced": {
+        "metrics": {
+            "pe_ratio": {"bands": [
+                {"min": 15, "max": 25, "points": 25},
+                {"below": 50, "points": 15},
+            ], "else": 5},
+            "profit_margin": {"bands": [
+                {"above": 0.20, "points": 20},
+                {"above": 0.10, "points": 15},
+            ], "else": 5},
+            "roe": {"bands": [
+                {"above": 0.15, "points": 20},
+                {"above": 0.10, "points": 15},
+            ], "else": 5},
+            "debt_equity": {"bands": [
+                {"below": 1.0, "points": 15},
+                {"below": 2.0, "points": 10},
+            ], "else": 5},
+            "current_ratio": {"bands": [
+                {"min": 1.5, "max": 3.0, "points": 10},
+                {"above": 1.0, "points": 5},
+            ], "else": 2},
+            "revenue_growth": {"bands": [
+                {"above": 0.15, "points": 10},
+                {"above": 0.05, "points": 5},
+            ], "else": 2},
+        },
+        "risk": [
+            {"level": "HIGH", "any": [["debt_equity", "above", 3.0], ["current_ratio", "below", 1.0]]},
+            {"level": "MEDIUM", "any": [["debt_equity", "above", 2.0], ["current_ratio", "below", 1.5]]},
+        ],
+        "default_risk": "LOW",
+        "recommendations": [
+            {"min_score": 80, "risk": "LOW", "label": "STRONG BUY"},
+            {"min_score": 70, "label": "BUY"},
+            {"min_score": 50, "label": "HOLD"},
+            {"min_score": 30, "label": "WEAK SELL"},
+        ],
+        "default_recommendation": "SELL",
+    },
+    "growth": {
+        "metrics": {
+            "revenue_growth": {"weight": 1.5, "bands": [
+                {"above": 0.25, "points": 20},
+                {"above": 0.15, "points": 14},
+                {"above": 0.05, "points": 6},
+            ], "else": 0},
+            "roe": {"bands": [
+                {"above": 0.20, "points": 20},
+                {"above": 0.10, "points": 12},
+            ], "else": 4},
+            "profit_margin": {"bands": [
+                {"above": 0.15, "points": 15},
+                {"above": 0.05, "points": 10},
+            ], "else": 5},
+            "pe_ratio": {"bands": [
+                {"below": 40, "points": 15},
+                {"below": 80, "points": 10},
+            ], "else": 5},
+            "debt_equity": {"bands": [
+                {"below": 1.5, "points": 10},
+                {"below": 3.0, "points": 5},
+            ], "else": 0},
+        },
+        "risk": [
+            {"level": "HIGH", "any": [["debt_equity", "above", 3.0], ["current_ratio", "below", 1.0]]},
+            {"level": "MEDIUM", "any": [["pe_ratio", "above", 60], ["current_ratio", "below", 1.5]]},
+        ],
+        "default_risk": "LOW",
+        "recommendations": [
+            {"min_score": 80, "risk": "LOW", "label": "STRONG BUY"},
+            {"min_score": 65, "label": "BUY"},
+            {"min_score": 45, "label": "HOLD"},
+            {"min_score": 25, "label": "WEAK SELL"},
+        ],
+        "default_recommendation": "SELL",
+    },
+    "value": {
+        "metrics": {
+            "pe_ratio": {"weight": 1.2, "bands": [
+                {"above": 0, "max": 12, "points": 25},
+                {"above": 0, "max": 18, "points": 18},
+                {"above": 0, "max": 25, "points": 10},
+            ], "else": 0},
+            "debt_equity": {"bands": [
+                {"below": 0.5, "points": 20},
+                {"below": 1.0, "points": 14},
+                {"below": 2.0, "points": 6},
+            ], "else": 0},
+            "current_ratio": {"bands": [
+                {"min": 2.0, "points": 15},
+                {"min": 1.5, "points": 10},
+            ], "else": 3},
+            "profit_margin": {"bands": [
+                {"above": 0.15, "points": 15},
+                {"above": 0.08, "points": 10},
+            ], "else": 3},
+            "roe": {"bands": [
+                {"above": 0.12, "points": 10},
+                {"above": 0.08, "points": 6},
+            ], "else": 2},
+        },
+        "risk": [
+            {"level": "HIGH", "any": [["debt_equity", "above", 2.5], ["current_ratio", "below", 1.0]]},
+            {"level": "MEDIUM", "any": [["debt_equity", "above", 1.5], ["current_ratio", "below", 1.5]]},
+        ],
+        "default_risk": "LOW",
+        "recommendations": [
+            {"min_score": 80, "risk": "LOW", "label": "STRONG BUY"},
+            {"min_score": 70, "label": "BUY"},
+            {"min_score": 50, "label": "HOLD"},
+            {"min_score": 30, "label": "WEAK SELL"},
+        ],
+        "default_recommendation": "SELL",
+    },
+}
+
+BOUNDS = {
+    "min": operator.ge,
+    "max": operator.le,
+    "above": operator.gt,
+    "below": operator.lt,
+}
+
+
+def _compile_bounds(bounds: list):
+    checks = tuple((BOUNDS[op], limit) for op, limit in bounds)
+    return lambda value: all(check(value, limit) for check, limit in checks)
+
+
+class CompiledStrategy:
+    """A strategy definition flattened into predicate tables"""
+
+    def __init__(self, definition: dict):
+        self.rules = []
+        self.max_points = 0
+        for metric, rule in definition["metrics"].items():
+            weight = rule.get("weight", 1.0)
+            bands = tuple(
+                (_compile_bounds([(op, band[op]) for op in BOUNDS if op in band]), band["points"] * weight)
+                for band in rule["bands"]
+            )
+            self.rules.append((metric, bands, rule["else"] * weight))
+            self.max_points += max([points for _, points in bands] + [rule["else"] * weight])
+
+        self.risks = tuple(
+            (level["level"], tuple(
+                (metric, _compile_bounds([(op, limit)])) for metric, op, limit in level["any"]
+            ))
+            for level in definition["risk"]
+        )
+        self.default_risk = definition["default_risk"]
+
+        self.recommendations = tuple(
+            (rec["min_score"], rec.get("risk"), rec["label"])
+            for rec in definition["recommendations"]
+        )
+        self.default_recommendation = definition["default_recommendation"]
+
+    def score(self, metrics: dict) -> float:
+        score = 0
+        for metric, bands, fallback in self.rules:
+            value = metrics[metric]
+            for matches, points in bands:
+                if matches(value):
+                    score += points
+                    break
+            else:
+                score += fallback
+        return score * 100 / self.max_points
+
+    def risk(self, metrics: dict) -> str:
+        for level, conditions in self.risks:
+            if any(matches(metrics[metric]) for metric, matches in conditions):
+                return level
+        return self.default_risk
+
+    def recommend(self, score: float, risk: str) -> str:
+        for min_score, required_risk, label in self.recommendations:
+            if score >= min_score and required_risk in (None, risk):
+                return label
+        return self.default_recommendation
+
+    def evaluate(self, metrics: dict) -> tuple:
+        score = self.score(metrics)
+        risk = self.risk(metrics)
+        return score, self.recommend(score, risk), risk
+
+
+def _metrics(company: dict) -> dict:
+    return {metric: company.get(metric, default) for metric, default in DEFAULT_RATIOS.items()}
+
+
 class AnalysisService:
     """Analyzes companies and generates scores"""
-    
+
+    def __init__(self, strategies: dict = None):
+        self.strategies = {
+            name: CompiledStrategy(definition)
+            for name, definition in (strategies or STRATEGIES).items()
+        }
+        self.default_strategy = DEFAULT_STRATEGY if DEFAULT_STRATEGY in self.strategies else next(iter(self.strategies))
+
     def calculate_score(self, company: dict) -> float:
         """Calculate investment score 0-100"""
-        score = 0
-        
-        # PE Ratio
-        if 15 <= company.get("pe_ratio", 20) <= 25:
-            score += 25
-        elif company.get("pe_ratio", 20) < 50:
-            score += 15
-        else:
-            score += 5
-        
-        # Profit Margin
-        profit_margin = company.get("profit_margin", 0.15)
-        if profit_margin > 0.20:
-            score += 20
-        elif profit_margin > 0.10:
-            score += 15
-        else:
-            score += 5
-        
-        # ROE
-        roe = company.get("roe", 0.15)
-        if roe > 0.15:
-            score += 20
-        elif roe > 0.10:
-            score += 15
-        else:
-            score += 5
-        
-        # Debt/Equity
-        debt_equity = company.get("debt_equity", 1.0)
-        if debt_equity < 1.0:
-            score += 15
-        elif debt_equity < 2.0:
-            score += 10
-        else:
-            score += 5
-        
-        # Current Ratio
-        current_ratio = company.get("current_ratio", 2.0)
-        if 1.5 <= current_ratio <= 3.0:
-            score += 10
-        elif current_ratio > 1.0:
-            score += 5
-        else:
-            score += 2
-        
-        # Revenue Growth
-        revenue_growth = company.get("revenue_growth", 0.10)
-        if revenue_growth > 0.15:
-            score += 10
-        elif revenue_growth > 0.05:
-            score += 5
-        else:
-            score += 2
-        
-        return min(score, 100)
-    
-    def get_recommendation(self, score: float, debt_equity: float, current_ratio: float) -> tuple:
-        """Get recommendation and risk level"""
-        if debt_equity > 3.0 or current_ratio < 1.0:
-            risk = "HIGH"
-        elif debt_equity > 2.0 or current_ratio < 1.5:
-            risk = "MEDIUM"
-        else:
-            risk = "LOW"
-        
-        if score >= 80 and risk == "LOW":
-            return "STRONG BUY", risk
-        elif score >= 70:
-            return "BUY", risk
-        elif score >= 50:
-            return "HOLD", risk
-        elif score >= 30:
-            return "WEAK SELL", risk
-        else:
-            return "SELL", risk
-    
-    def analyze_companies(self, companies: list) -> list:
-        """Analyze all companies"""
+        return self.strategies[self.default_strategy].score(_metrics(company))
+
+    def get_recommendation(self, company: dict, strategy: str = None) -> tuple:
+        """Get recommendation and risk level under a strategy (default if omitted)"""
+        _, recommendation, risk = self.strategies[strategy or self.default_strategy].evaluate(_metrics(company))
+        return recommendation, risk
+
+    def analyze_companies(self, companies: list, strategies: list = None) -> list:
+        """Analyze all companies under every active strategy"""
+        names = strategies or list(self.strategies)
+        unknown = [name for name in names if name not in self.strategies]
+        if unknown:
+            raise ValueError(f"Unknown strategies: {', '.join(unknown)}")
+        evaluators = [(name, self.strategies[name].evaluate) for name in names]
+        primary = self.default_strategy if self.default_strategy in names else names[0]
+
         results = []
-        
+
         for company in companies:
             if not company:
                 continue
-            
-            score = self.calculate_score(company)
-            recommendation, risk = self.get_recommendation(
-                score,
-                company.get("debt_equity", 1.0),
-                company.get("current_ratio", 2.0)
-            )
-            
+
+            metrics = _metrics(company)
+            strategy_results = {}
+            for name, evaluate in evaluators:
+                score, recommendation, risk = evaluate(metrics)
+                strategy_results[name] = {
+                    "score": round(score, 1),
+                    "recommendation": recommendation,
+                    "risk": risk
+                }
+
             results.append({
                 "ticker": company["ticker"],
                 "name": company.get("name", "N/A"),
                 "price": company.get("price", 0),
-                "score": round(score, 1),
-                "recommendation": recommendation,
-                "risk": risk,
+                **strategy_results[primary],
+                "strategy": primary,
+                "strategies": strategy_results,
                 "metrics": {
                     "pe": f"{company.get('pe_ratio', 0):.1f}x",
                     "profit_margin": f"{company.get('profit_margin', 0)*100:.1f}%",
@@ -114,7 +272,7 @@ class AnalysisService:
                     "current_ratio": f"{company.get('current_ratio', 0):.2f}"
                 }
             })
-        
+
         # Sort by score
         results.sort(key=lambda x: x["score"], reverse=True)
         return results
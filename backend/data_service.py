@@ -3,9 +3,36 @@
 # ============================================================
 
 import requests
+import numbers
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+DEFAULT_RATIOS = {
+    "pe_ratio": 20,
+    "profit_margin": 0.15,
+    "roe": 0.15,
+    "debt_equity": 1.0,
+    "current_ratio": 2.0,
+    "revenue_growth": 0.10
+}
+
+# FMP ratio fields; FMP sends null for ratios it can't compute
+FMP_RATIO_FIELDS = {
+    "pe_ratio": "peRatioTTM",
+    "profit_margin": "netProfitMarginTTM",
+    "roe": "roeTTM",
+    "debt_equity": "debtToEquityTTM",
+    "current_ratio": "currentRatioTTM"
+}
+
+def _number(value, default: float) -> float:
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        return value
+    return default
 
 class DataService:
     """Fetches real-time financial data from APIs"""
@@ -13,7 +40,33 @@ class DataService:
     def __init__(self):
         self.finnhub_key = os.getenv("FINNHUB_API_KEY")
         self.fmp_key = os.getenv("FMP_API_KEY")
-        self.cache = {}
+        self.cache_ttl = float(os.getenv("CACHE_TTL", 300))
+        self.cache_size = int(os.getenv("CACHE_MAX_ENTRIES", 500))
+        self.cache = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get_company_data(self, ticker: str, max_age: float = None) -> Dict[str, Any]:
+        """Return cached company data younger than max_age (default CACHE_TTL), otherwise fetch it"""
+        if max_age is None:
+            max_age = self.cache_ttl
+        with self._lock:
+            entry = self.cache.get(ticker)
+            if entry:
+                self.cache.move_to_end(ticker)
+        if entry and time.time() - entry[0] <= max_age:
+            return entry[1]
+        return self.fetch_company_data(ticker)
+    
+    def cache_age(self, ticker: str):
+        """Seconds since the ticker was last fetched, or None"""
+        with self._lock:
+            entry = self.cache.get(ticker)
+        return time.time() - entry[0] if entry else None
+    
+    def evict(self, ticker: str):
+        """Drop a ticker from the cache"""
+        with self._lock:
+            self.cache.pop(ticker, None)
     
     def fetch_company_data(self, ticker: str) -> Dict[str, Any]:
         """Fetch complete company data"""
@@ -23,10 +76,14 @@ class DataService:
             name = self._fetch_name(ticker)
             ratios = self._fetch_ratios(ticker)
             
-            return {
+            # Only cache results where every upstream call succeeded
+            complete = None not in (price, name, ratios)
+            ratios = ratios or DEFAULT_RATIOS
+            
+            data = {
                 "ticker": ticker,
-                "name": name,
-                "price": price,
+                "name": name or ticker,
+                "price": price or 0.0,
                 "pe_ratio": ratios.get("pe_ratio", 20),
                 "profit_margin": ratios.get("profit_margin", 0.15),
                 "roe": ratios.get("roe", 0.15),
@@ -35,56 +92,57 @@ class DataService:
                 "revenue_growth": ratios.get("revenue_growth", 0.10),
                 "timestamp": datetime.now().isoformat()
             }
+            if complete:
+                with self._lock:
+                    self.cache[ticker] = (time.time(), data)
+                    self.cache.move_to_end(ticker)
+                    while len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+            return data
         except Exception as e:
             print(f"Error fetching {ticker}: {e}")
             return None
     
-    def _fetch_price(self, ticker: str) -> float:
-        """Get stock price"""
+    def _fetch_price(self, ticker: str) -> Optional[float]:
+        """Get stock price, or None if the request failed"""
         try:
             url = "https://finnhub.io/api/v1/quote"
             params = {"symbol": ticker, "token": self.finnhub_key}
             r = requests.get(url, params=params, timeout=5)
+            r.raise_for_status()
             return r.json().get("c", 0)
         except:
-            return 0.0
+            return None
     
-    def _fetch_name(self, ticker: str) -> str:
-        """Get company name"""
+    def _fetch_name(self, ticker: str) -> Optional[str]:
+        """Get company name, or None if the request failed"""
         try:
             url = "https://finnhub.io/api/v1/stock/profile2"
             params = {"symbol": ticker, "token": self.finnhub_key}
             r = requests.get(url, params=params, timeout=5)
+            r.raise_for_status()
             return r.json().get("name", ticker)
         except:
-            return ticker
+            return None
     
-    def _fetch_ratios(self, ticker: str) -> Dict:
-        """Get financial ratios"""
+    def _fetch_ratios(self, ticker: str) -> Optional[Dict]:
+        """Get financial ratios, or None if unavailable"""
         try:
             url = f"https://financialmodelingprep.com/api/v3/financial-ratios-ttm/{ticker}"
             params = {"apikey": self.fmp_key}
             r = requests.get(url, params=params, timeout=5)
+            r.raise_for_status()
             data = r.json()
             
-            if data and len(data) > 0:
-                ratio = data
-                return {
-                    "pe_ratio": ratio.get("peRatioTTM", 20),
-                    "profit_margin": ratio.get("netProfitMarginTTM", 0.15),
-                    "roe": ratio.get("roeTTM", 0.15),
-                    "debt_equity": ratio.get("debtToEquityTTM", 1.0),
-                    "current_ratio": ratio.get("currentRatioTTM", 2.0),
-                    "revenue_growth": 0.10
+            if isinstance(data, list) and len(data) > 0:
+                ratio = data[0]
+                ratios = {
+                    key: _number(ratio.get(field), DEFAULT_RATIOS[key])
+                    for key, field in FMP_RATIO_FIELDS.items()
                 }
+                ratios["revenue_growth"] = DEFAULT_RATIOS["revenue_growth"]
+                return ratios
         except:
             pass
         
-        return {
-            "pe_ratio": 20,
-            "profit_margin": 0.15,
-            "roe": 0.15,
-            "debt_equity": 1.0,
-            "current_ratio": 2.0,
-            "revenue_growth": 0.10
-        }
+        return None
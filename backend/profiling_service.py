@@ -0,0 +1,163 @@
+# ============================================================
+# REQUEST PROFILING SERVICE (On-demand diagnostics)
+# ============================================================
+
+import hmac
+import os
+import sys
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+PROFILE_HEADER = "X-Profile-Token"
+
+
+class StackSampler:
+    """Samples the call stack of one thread at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                if code is STOP_CODE:
+                    # The profiled thread is shutting this sampler down
+                    stack = None
+                    break
+                filename = os.path.basename(code.co_filename)
+                stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+
+            if stack is None:
+                continue
+
+            # Collapsed format is root-first
+            self.stacks[";".join(reversed(stack))] += 1
+
+
+STOP_CODE = StackSampler.stop.__code__
+
+
+class ProfilingService:
+    """Captures opt-in stack traces of individual requests"""
+
+    def __init__(self):
+        self.token = os.getenv("PROFILE_TOKEN")
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+        self.interval = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000
+        self.traces = deque(maxlen=int(os.getenv("PROFILE_BUFFER_SIZE", 50)))
+        self.active = 0
+        self.started = 0
+        self._lock = threading.Lock()
+
+        if self.sample_rate > 0 and not self.token:
+            # Sampled traces could never be downloaded from the admin endpoints
+            print("⚠️ PROFILE_SAMPLE_RATE ignored: PROFILE_TOKEN is not set")
+            self.sample_rate = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def is_authorized(self, token: Optional[str]) -> bool:
+        """Check a privileged token against PROFILE_TOKEN"""
+        if not self.token or not token:
+            return False
+        return hmac.compare_digest(token.encode(), self.token.encode())
+
+    def should_profile(self, token: Optional[str]) -> bool:
+        """Decide whether the current request is profiled"""
+        if self.is_authorized(token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def track(self):
+        """Count an in-flight request so traces can report overlap"""
+        with self._lock:
+            self.active += 1
+            self.started += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    @contextmanager
+    def profile(self, method: str, path: str):
+        """Sample the calling thread until the block exits
+
+        The calling thread is the event loop thread, so samples include any
+        request that ran on it meanwhile; "concurrent_requests" says how many.
+        """
+        trace = {
+            "id": uuid.uuid4().hex,
+            "method": method,
+            "path": path,
+            "scope": "event_loop_thread",
+            "started_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            # Other requests in flight now, excluding this one
+            overlapping = self.active - 1
+            started = self.started
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            yield trace
+        finally:
+            stacks = sampler.stop()
+            with self._lock:
+                overlapping += self.started - started
+            trace["concurrent_requests"] = overlapping
+            trace["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            trace["samples"] = sum(stacks.values())
+            trace["stacks"] = stacks
+            with self._lock:
+                self.traces.append(trace)
+
+    def list_traces(self) -> list:
+        """Summaries of buffered traces, newest first"""
+        with self._lock:
+            traces = list(self.traces)
+        return [
+            {k: v for k, v in trace.items() if k != "stacks"}
+            for trace in reversed(traces)
+        ]
+
+    def get_trace(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for trace in self.traces:
+                if trace["id"] == trace_id:
+                    return trace
+        return None
+
+    def to_collapsed(self, trace: Dict[str, Any]) -> str:
+        """Render a trace in flamegraph.pl / speedscope collapsed format"""
+        lines = [f"{stack} {count}" for stack, count in trace["stacks"].most_common()]
+        return "\n".join(lines) + "\n"
@@ -3,55 +3,186 @@
 # ============================================================
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from concurrent.futures import ThreadPoolExecutor
 from backend.data_service import DataService
-from backend.analysis_service import AnalysisService
-from backend.advisory_service import AdvisoryService
-from datetime import datetime
-import json
+import math
+import os
+import threading
+import time
 
-def init_scheduler():
-    """Initialize background scheduler"""
-    
-    scheduler = BackgroundScheduler()
-    
-    data_service = DataService()
-    analysis_service = AnalysisService()
-    advisory_service = AdvisoryService()
-    
-    def hourly_wealth_advisor():
-        """Run wealth advisor every hour"""
-        print(f"\n{'='*70}")
-        print(f"SCHEDULED WEALTH ADVISOR - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"{'='*70}")
-        
+SEED_TICKERS = ["AAPL", "MSFT", "GOOGL", "NVDA", "SHOP", "UPST"]
+
+# Upstream calls made by one DataService.fetch_company_data
+CALLS_PER_REFRESH = 3
+
+class RefreshScheduler:
+    """Refreshes tickers in the background, most requested first"""
+
+    def __init__(self, data_service: DataService, seed_tickers: list = None):
+        self.data_service = data_service
+        self.min_interval = float(os.getenv("REFRESH_MIN_INTERVAL", 240))
+        self.max_interval = float(os.getenv("REFRESH_MAX_INTERVAL", 6 * 3600))
+        self.half_life = float(os.getenv("REFRESH_POPULARITY_HALF_LIFE", 3600))
+        self.max_workers = int(os.getenv("REFRESH_WORKERS", 4))
+        self.max_tracked = int(os.getenv("REFRESH_MAX_TRACKED", 1000))
+
+        # Share of the upstream rate limit left for refreshes
+        rate_per_minute = float(os.getenv("UPSTREAM_RATE_PER_MINUTE", 60))
+        budget_share = float(os.getenv("REFRESH_BUDGET_SHARE", 0.5))
+        refreshes_per_minute = rate_per_minute * budget_share / CALLS_PER_REFRESH
+        # No budget means no background refresh; requests still fetch on demand
+        self.tick_seconds = 60 / refreshes_per_minute if refreshes_per_minute > 0 else None
+
+        self.seed_tickers = set(seed_tickers if seed_tickers is not None else SEED_TICKERS)
+        self.popularity = {ticker: (0.0, time.time()) for ticker in self.seed_tickers}
+        self.last_attempt = {}
+        self.in_flight = set()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="refresh")
+        self._lock = threading.Lock()
+
+    def _decayed(self, ticker: str, now: float) -> float:
+        score, updated = self.popularity[ticker]
+        return score * math.pow(0.5, (now - updated) / self.half_life)
+
+    def _forget(self, ticker: str):
+        del self.popularity[ticker]
+        self.last_attempt.pop(ticker, None)
+        self.data_service.evict(ticker)
+
+    def _prune(self, now: float):
+        # Drop tickers nobody has asked for in a while
+        for ticker in list(self.popularity):
+            if ticker not in self.seed_tickers and ticker not in self.in_flight \
+                    and self._decayed(ticker, now) < 0.05:
+                self._forget(ticker)
+
+        # Still over the cap: drop the least popular
+        excess = len(self.popularity) - self.max_tracked
+        if excess > 0:
+            candidates = sorted(
+                (t for t in self.popularity if t not in self.seed_tickers and t not in self.in_flight),
+                key=lambda t: self._decayed(t, now)
+            )
+            for ticker in candidates[:excess]:
+                self._forget(ticker)
+
+    def record(self, ticker: str):
+        """Count a client request for a ticker"""
+        now = time.time()
+        with self._lock:
+            score = self._decayed(ticker, now) if ticker in self.popularity else 0.0
+            self.popularity[ticker] = (score + 1, now)
+            if len(self.popularity) > self.max_tracked:
+                self._prune(now)
+
+    def _age(self, ticker: str, now: float):
+        # Fetches with any failed upstream call aren't cached, so back off from the attempt too
+        age = self.data_service.cache_age(ticker)
+        attempted = self.last_attempt.get(ticker)
+        if attempted is not None:
+            age = now - attempted if age is None else min(age, now - attempted)
+        return age
+
+    def interval_for(self, score: float) -> float:
+        """Target refresh interval, shrinking as popularity grows"""
+        return max(self.min_interval, self.max_interval / (1 + score))
+
+    def max_age_for(self, score: float) -> float:
+        """Oldest cached entry still served, allowing the refresh one min_interval to land"""
+        if self.tick_seconds is None:
+            return self.data_service.cache_ttl
+        return self.interval_for(score) + self.min_interval
+
+    def max_age(self, ticker: str) -> float:
+        """Serving threshold for a ticker's cached data"""
+        now = time.time()
+        with self._lock:
+            score = self._decayed(ticker, now) if ticker in self.popularity else 0.0
+        return self.max_age_for(score)
+
+    def tick(self):
+        """Dispatch the most overdue ticker to the worker pool"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if len(self.in_flight) >= self.max_workers:
+                return
+
+            best, best_overdue = None, 1.0
+            for ticker in self.popularity:
+                score = self._decayed(ticker, now)
+                if ticker in self.in_flight:
+                    continue
+
+                age = self._age(ticker, now)
+                overdue = math.inf if age is None else age / self.interval_for(score)
+                if overdue >= best_overdue:
+                    best, best_overdue = ticker, overdue
+
+            if best is None:
+                return
+            self.in_flight.add(best)
+            self.last_attempt[best] = now
+
+        self.executor.submit(self._refresh, best)
+
+    def _refresh(self, ticker: str):
         try:
-            tickers = ["AAPL", "MSFT", "GOOGL", "NVDA", "SHOP", "UPST"]
-            
-            # Fetch data
-            companies = []
-            for ticker in tickers:
-                data = data_service.fetch_company_data(ticker)
-                if data:
-                    companies.append(data)
-            
-            # Analyze
-            analysis = analysis_service.analyze_companies(companies)
-            
-            # Generate advice
-            advice = advisory_service.generate_advice(analysis)
-            
-            print(f"✓ Advisory generated for {len(companies)} companies")
-            
+            self.data_service.fetch_company_data(ticker)
         except Exception as e:
-            print(f"❌ Error: {e}")
-    
-    # Add hourly job
-    scheduler.add_job(
-        hourly_wealth_advisor,
-        'interval',
-        hours=1,
-        id='wealth_advisor_hourly',
-        name='Hourly wealth advisor update'
-    )
-    
+            print(f"❌ Refresh failed for {ticker}: {e}")
+        finally:
+            with self._lock:
+                self.in_flight.discard(ticker)
+
+    def status(self) -> list:
+        """Per-ticker popularity and staleness, most popular first"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            tickers = {ticker: self._decayed(ticker, now) for ticker in self.popularity}
+            in_flight = set(self.in_flight)
+
+        report = []
+        for ticker, score in sorted(tickers.items(), key=lambda item: item[1], reverse=True):
+            age = self.data_service.cache_age(ticker)
+            max_age = self.max_age_for(score)
+            report.append({
+                "ticker": ticker,
+                "popularity": round(score, 2),
+                "refresh_interval_seconds": round(self.interval_for(score)),
+                "max_age_seconds": round(max_age),
+                "age_seconds": round(age) if age is not None else None,
+                # Matches the threshold at which requests fall back to upstream
+                "stale": age is None or age > max_age,
+                "refreshing": ticker in in_flight
+            })
+        return report
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+def init_scheduler(refresh_scheduler: RefreshScheduler):
+    """Initialize background scheduler"""
+
+    scheduler = BackgroundScheduler()
+
+    if refresh_scheduler.tick_seconds is None:
+        print("✓ Background refresh disabled: no upstream rate budget")
+    else:
+        # One dispatch per tick keeps refreshes evenly spaced within the rate budget
+        scheduler.add_job(
+            refresh_scheduler.tick,
+            'interval',
+            seconds=refresh_scheduler.tick_seconds,
+            id='ticker_refresh',
+            name='Popularity-weighted ticker refresh',
+            max_instances=1,
+            coalesce=True
+        )
+        print(f"✓ Refreshing tickers every {refresh_scheduler.tick_seconds:.1f}s "
+              f"with {refresh_scheduler.max_workers} workers")
+
+    scheduler.start()
+
     return scheduler
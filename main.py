@@ -2,17 +2,19 @@
 # MAIN FASTAPI APPLICATION
 # ============================================================
 
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from datetime import datetime
 import os
 from apscheduler.schedulers.background import BackgroundScheduler
 from dotenv import load_dotenv
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import json
 class TickerList(BaseModel):
     tickers: List[str]
+    strategies: Optional[List[str]] = None
 load_dotenv()
 
 app = FastAPI(
@@ -33,16 +35,47 @@ app.add_middleware(
 from backend.data_service import DataService
 from backend.analysis_service import AnalysisService
 from backend.advisory_service import AdvisoryService
-from backend.scheduler import init_scheduler
+from backend.profiling_service import ProfilingService, PROFILE_HEADER
+from backend.scheduler import RefreshScheduler, init_scheduler
 
 # Initialize services
 data_service = DataService()
 analysis_service = AnalysisService()
 advisory_service = AdvisoryService()
+profiling_service = ProfilingService()
+
+# ============================================================
+# REQUEST PROFILING MIDDLEWARE
+# ============================================================
+
+async def profile_requests(request: Request, call_next):
+    """Capture a stack trace for opted-in API requests"""
+    path = request.url.path
+    if not path.startswith("/api/v1/") or path.startswith("/api/v1/admin/"):
+        return await call_next(request)
+
+    with profiling_service.track():
+        if not profiling_service.should_profile(request.headers.get(PROFILE_HEADER)):
+            return await call_next(request)
+
+        with profiling_service.profile(request.method, path) as trace:
+            response = await call_next(request)
+    response.headers["X-Profile-Id"] = trace["id"]
+    return response
+
+# Only registered when configured, so there is no per-request cost otherwise
+if profiling_service.enabled:
+    app.middleware("http")(profile_requests)
 
 # Initialize scheduler
+refresh_scheduler = RefreshScheduler(data_service)
 scheduler = None
 
+def load_company_data(ticker: str):
+    """Serve company data from cache and count the request toward refresh priority"""
+    refresh_scheduler.record(ticker)
+    return data_service.get_company_data(ticker, refresh_scheduler.max_age(ticker))
+
 # ============================================================
 # HEALTH CHECK ENDPOINT
 # ============================================================
@@ -64,7 +97,7 @@ async def health_check():
 async def fetch_company(ticker: str):
     """Fetch company data for a ticker"""
     try:
-        company_data = data_service.fetch_company_data(ticker)
+        company_data = load_company_data(ticker)
         return {
             "success": True,
             "data": company_data,
@@ -80,7 +113,7 @@ async def analyze_companies(ticker_list: TickerList):
     try:
         companies_data = []
         for ticker in tickers:
-            data = data_service.fetch_company_data(ticker)
+            data = load_company_data(ticker)
             companies_data.append(data)
         
         return {
@@ -102,7 +135,7 @@ async def analyze_companies(tickers: list):
     try:
         companies_data = []
         for ticker in tickers:
-            data = data_service.fetch_company_data(ticker)
+            data = load_company_data(ticker)
             companies_data.append(data)
         
         analysis = analysis_service.analyze_companies(companies_data)
@@ -115,6 +148,16 @@ async def analyze_companies(tickers: list):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/strategies")
+async def list_strategies():
+    """List available scoring strategies"""
+    return {
+        "success": True,
+        "strategies": list(analysis_service.strategies),
+        "default": analysis_service.default_strategy,
+        "timestamp": datetime.now().isoformat()
+    }
+
 # ============================================================
 # ADVISORY ENDPOINTS (Rune γ)
 # ============================================================
@@ -126,10 +169,10 @@ async def generate_advice(ticker_list: TickerList):
     try:
         companies_data = []
         for ticker in tickers:
-            data = data_service.fetch_company_data(ticker)
+            data = load_company_data(ticker)
             companies_data.append(data)
         
-        analysis = analysis_service.analyze_companies(companies_data)
+        analysis = analysis_service.analyze_companies(companies_data, ticker_list.strategies)
         advice = advisory_service.generate_advice(analysis)
         
         return {
@@ -138,6 +181,8 @@ async def generate_advice(ticker_list: TickerList):
             "analysis": analysis,
             "timestamp": datetime.now().isoformat()
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -156,7 +201,7 @@ async def complete_wealth_advisory(
         # Step 1: Fetch data
         companies_data = []
         for ticker in tickers:
-            data = data_service.fetch_company_data(ticker)
+            data = load_company_data(ticker)
             companies_data.append(data)
         
         # Step 2: Analyze
@@ -186,6 +231,53 @@ async def complete_wealth_advisory(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# ============================================================
+# REFRESH STATUS ENDPOINT
+# ============================================================
+
+@app.get("/api/v1/refresh/status")
+async def refresh_status():
+    """Report per-ticker popularity and staleness"""
+    tickers = refresh_scheduler.status()
+    return {
+        "success": True,
+        "tickers": tickers,
+        "stale_count": sum(1 for t in tickers if t["stale"]),
+        "timestamp": datetime.now().isoformat()
+    }
+
+# ============================================================
+# ADMIN PROFILING ENDPOINTS
+# ============================================================
+
+def require_profile_token(token: Optional[str]):
+    if not profiling_service.is_authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+@app.get("/api/v1/admin/profiles")
+async def list_profiles(x_profile_token: Optional[str] = Header(None)):
+    """List buffered request profiles"""
+    require_profile_token(x_profile_token)
+    profiles = profiling_service.list_traces()
+    return {
+        "success": True,
+        "profiles": profiles,
+        "count": len(profiles),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/api/v1/admin/profiles/{profile_id}")
+async def download_profile(profile_id: str, x_profile_token: Optional[str] = Header(None)):
+    """Download a profile as collapsed stacks for flamegraph tools"""
+    require_profile_token(x_profile_token)
+    trace = profiling_service.get_trace(profile_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        profiling_service.to_collapsed(trace),
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'}
+    )
+
 # ============================================================
 # STARTUP EVENT
 # ============================================================
@@ -194,7 +286,7 @@ async def complete_wealth_advisory(
 async def startup_event():
     """Initialize scheduler on app startup"""
     global scheduler
-    scheduler = init_scheduler()
+    scheduler = init_scheduler(refresh_scheduler)
     print("✓ Application started with scheduler")
 
 @app.on_event("shutdown")
@@ -202,6 +294,7 @@ async def shutdown_event():
     """Shutdown scheduler"""
     if scheduler:
         scheduler.shutdown()
+        refresh_scheduler.shutdown()
         print("✓ Scheduler shut down")
 
 if __name__ == "__main__":